@@ -1,10 +1,31 @@
 import json
-from typing import Dict, List, Any, Tuple
-from dataclasses import dataclass
-from collections import defaultdict
+from typing import Dict, List, Any, Tuple, Iterable
+from dataclasses import dataclass, field
 import sys
+from array import array
+from itertools import compress
 import os
 from datetime import datetime
+import numpy as np
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Files larger than this are streamed with ijson instead of parsed in memory
+STREAMING_THRESHOLD_BYTES = 32 * 1024 * 1024
+
+# Marks a prefix that never appeared in a streamed file
+_MISSING = object()
+
+# An error is considered a pattern if it occurs at least this many times
+MIN_PATTERN_FREQUENCY = 3
 
 @dataclass
 class ModelPerformance:
@@ -13,149 +34,292 @@ class ModelPerformance:
     total_cost: float
     avg_latency: float
 
+class _ProvAcc:
+    """Running totals for a single provider."""
+    __slots__ = ('successes', 'total', 'cost', 'success_cost', 'lat_sum', 'lat_n')
+
+    def __init__(self):
+        self.successes = 0
+        self.total = 0
+        self.cost = 0.0
+        self.success_cost = 0.0
+        self.lat_sum = 0.0
+        self.lat_n = 0
+
+class _ErrorAcc:
+    """Compact record for one distinct error message."""
+    __slots__ = ('count', 'providers', 'prompts', 'test_idxs', 'first_vars')
+
+    def __init__(self, first_vars: Dict):
+        self.count = 0
+        self.providers = set()
+        self.prompts = set()
+        self.test_idxs = []
+        self.first_vars = first_vars
+
+@dataclass
+class _Aggregates:
+    """Per-provider and per-error accumulators built in a single pass over the results."""
+    provider_stats: Dict[str, _ProvAcc] = field(default_factory=dict)
+    error_info: Dict[str, _ErrorAcc] = field(default_factory=dict)
+    total_cost: float = 0.0
+
+def _aggregate_results(results: Iterable[Dict[str, Any]]) -> _Aggregates:
+    """Walk the results once, collecting everything the analyses need."""
+    agg = _Aggregates()
+    error_info = agg.error_info
+    # Provider ids are factorized to integer codes in first-seen order
+    codes = {}
+    # Per-row columns live in typed, contiguous buffers rather than lists of boxed objects
+    provider_codes, successes = array('q'), array('B')
+    costs, latencies = array('d'), array('d')
+    total_cost = 0.0
+    last_provider = None
+
+    # Bind hot-loop lookups to locals once. Provider ids and error messages are
+    # interned so the repeated dict and set keys compare by identity
+    get = dict.get
+    intern = sys.intern
+    code_of = codes.get
+    add_code = provider_codes.append
+    add_success = successes.append
+    add_cost = costs.append
+    add_latency = latencies.append
+    error_of = error_info.get
+
+    for result in results:
+        provider = intern(result['provider']['id'])
+        success = result['success']
+        # Runs of the same provider (always the case for single-provider files)
+        # reuse the previous code without a dict lookup
+        if provider is not last_provider:
+            code = code_of(provider)
+            if code is None:
+                code = codes[provider] = len(codes)
+            last_provider = provider
+        add_code(code)
+        add_success(1 if success else 0)
+        cost = get(result, 'cost', 0) or 0
+        total_cost += cost
+        add_cost(cost)
+        add_latency(result['latencyMs'])
+        if not success:
+            error = get(result, 'error', 'Unknown error')
+            if type(error) is str:
+                error = intern(error)
+            test_idx = result['testIdx']
+            rec = error_of(error)
+            if rec is None:
+                rec = error_info[error] = _ErrorAcc(get(result, 'vars', {}))
+            rec.count += 1
+            rec.providers.add(provider)
+            rec.prompts.add(get(result, 'prompt', {}).get('raw', ''))
+            rec.test_idxs.append(test_idx)
+
+    agg.total_cost = total_cost
+    if not codes:
+        return agg
+
+    provider_stats = agg.provider_stats
+    if len(codes) == 1:
+        # Single provider: every row is in the same group, so skip the bincount groupby
+        acc = provider_stats[next(iter(codes))] = _ProvAcc()
+        acc.total = acc.lat_n = len(successes)
+        acc.successes = sum(successes)
+        acc.cost = total_cost
+        acc.success_cost = sum(compress(costs, successes), 0.0)
+        acc.lat_sum = sum(latencies, 0.0)
+        return agg
+
+    # Struct-of-arrays layout, reduced per provider with bincount
+    idx = np.frombuffer(provider_codes, dtype=np.int64)
+    success_arr = np.frombuffer(successes, dtype=np.bool_)
+    cost_arr = np.frombuffer(costs, dtype=np.float64)
+    latency_arr = np.frombuffer(latencies, dtype=np.float64)
+    n = len(codes)
+
+    totals = np.bincount(idx, minlength=n).tolist()
+    success_counts = np.bincount(idx, weights=success_arr, minlength=n).astype(np.int64).tolist()
+    cost_sums = np.bincount(idx, weights=cost_arr, minlength=n).tolist()
+    success_cost_sums = np.bincount(idx, weights=np.where(success_arr, cost_arr, 0.0), minlength=n).tolist()
+    latency_sums = np.bincount(idx, weights=latency_arr, minlength=n).tolist()
+
+    for provider, code in codes.items():
+        acc = provider_stats[provider] = _ProvAcc()
+        acc.total = acc.lat_n = totals[code]
+        acc.successes = success_counts[code]
+        acc.cost = cost_sums[code]
+        acc.success_cost = success_cost_sums[code]
+        acc.lat_sum = latency_sums[code]
+
+    return agg
+
 class PromptfooAnalyzer:
     def __init__(self, json_file: str):
-        self.data = self._load_json_file(json_file)
-        self.results = self.data['results']['results']
-        self.stats = self.data['results']['stats']
+        self._agg, self.stats = self._load_results(json_file)
+        self._total = self.stats.get('successes', 0) + self.stats.get('failures', 0)
+        self._overall_success = self.stats.get('successes', 0) / self._total if self._total else 0.0
+        # Analyses are cached on first use; the analyzer is immutable after construction
+        self._model_performance = None
+        self._error_patterns = None
+
+    @property
+    def total_cost(self) -> float:
+        """Total cost across all results, accumulated during loading."""
+        return self._agg.total_cost
+
+    @property
+    def total_tests(self) -> int:
+        """Number of tests run, from the promptfoo stats."""
+        return self._total
+
+    @property
+    def overall_success_rate(self) -> float:
+        """Overall success rate as a percentage, 0 when no tests were run."""
+        return self._overall_success * 100
     
-    def _load_json_file(self, file_path: str) -> Dict:
+    def _load_results(self, file_path: str) -> Tuple[_Aggregates, Dict]:
         """
-        Attempt to load JSON file with different encodings and error handlers
+        Aggregate the results without keeping them around. Large files are
+        streamed into the aggregator so the results array is never materialized
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        encodings = ['utf-8', 'utf-8-sig', 'latin1', 'cp1252']
-        errors = ['strict', 'ignore', 'replace']
-        
-        for encoding in encodings:
-            for error_handler in errors:
-                try:
-                    print(f"Attempting to read with {encoding} encoding and {error_handler} error handler...")
-                    with open(file_path, 'r', encoding=encoding, errors=error_handler) as f:
-                        content = f.read()
-                        return json.loads(content)
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON with {encoding} encoding: {str(e)}")
-                    continue
-                except Exception as e:
-                    print(f"Unexpected error: {str(e)}")
-                    continue
+        if ijson is not None and os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+            try:
+                with open(file_path, 'rb') as f:
+                    agg = _aggregate_results(ijson.items(f, 'results.results.item', use_float=True))
+                    # Fail on a wrong-shaped file the same way the in-memory path does.
+                    # Only a run without rows needs a look for the results array itself
+                    if not agg.provider_stats:
+                        f.seek(0)
+                        if next(ijson.items(f, 'results.results'), _MISSING) is _MISSING:
+                            raise KeyError('results')
+                    # The stats read stops as soon as the stats object has been built
+                    f.seek(0)
+                    stats = next(ijson.items(f, 'results.stats', use_float=True), _MISSING)
+                    if stats is _MISSING:
+                        raise KeyError('stats')
+                return agg, stats
+            except ijson.JSONError:
+                # Not valid UTF-8 JSON; let the encoding fallbacks handle it
+                pass
+
+        data = self._load_json_file(file_path)
+        return _aggregate_results(data['results']['results']), data['results']['stats']
+
+    def _load_json_file(self, file_path: str) -> Dict:
+        """
+        Load JSON file, detecting the encoding when it is not plain UTF-8
+        """
+        with open(file_path, 'rb') as f:
+            content = f.read()
+
+        # Fast path: parse the raw UTF-8 bytes directly
+        try:
+            return json_loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+
+        # Slow path: sniff the encoding once, among the encodings results files
+        # actually use, and parse the decoded text
+        from charset_normalizer import from_bytes
+        match = from_bytes(content, cp_isolation=['utf_8', 'cp1252', 'latin_1']).best()
+        if match is not None:
+            print(f"Reading with detected {match.encoding} encoding...")
+            try:
+                return json.loads(str(match))
+            except json.JSONDecodeError as e:
+                print(f"Error parsing JSON with {match.encoding} encoding: {str(e)}")
         
-        raise ValueError(f"Could not read file {file_path} with any of the attempted encodings")
+        raise ValueError(f"Could not read file {file_path} with a detected encoding")
 
     def analyze_model_performance(self) -> Dict[str, ModelPerformance]:
         """Analyze performance metrics for each model/provider."""
-        model_stats = defaultdict(lambda: {'successes': 0, 'total': 0, 'cost': 0.0, 'latency': []})
-        
-        for result in self.results:
-            provider = result['provider']['id']
-            model_stats[provider]['total'] += 1
-            model_stats[provider]['successes'] += 1 if result['success'] else 0
-            model_stats[provider]['cost'] += result.get('cost', 0)
-            model_stats[provider]['latency'].append(result['latencyMs'])
-            
-        return {
+        if self._model_performance is not None:
+            return self._model_performance
+
+        self._model_performance = {
             model: ModelPerformance(
-                success_rate=stats['successes'] / stats['total'] * 100,
-                total_tests=stats['total'],
-                total_cost=stats['cost'],
-                avg_latency=sum(stats['latency']) / len(stats['latency'])
+                success_rate=acc.successes / acc.total * 100,
+                total_tests=acc.total,
+                total_cost=acc.cost,
+                avg_latency=acc.lat_sum / acc.lat_n
             )
-            for model, stats in model_stats.items()
+            for model, acc in self._agg.provider_stats.items()
         }
+        return self._model_performance
 
     def identify_problematic_patterns(self) -> List[Dict[str, Any]]:
         """Identify patterns in test failures and issues."""
-        patterns = []
-        
-        # Group failures by error type
-        error_patterns = defaultdict(list)
-        for result in self.results:
-            if not result['success']:
-                error_patterns[result.get('error', 'Unknown error')].append(result)
-        
-        # Identify significant patterns
-        for error, instances in error_patterns.items():
-            if len(instances) >= 3:  # Consider it a pattern if it occurs 3 or more times
-                patterns.append({
-                    'type': 'error_pattern',
-                    'error': error,
-                    'frequency': len(instances),
-                    'affected_tests': [i['testIdx'] for i in instances]
-                })
-                
-        return patterns
+        return [
+            {
+                'type': 'error_pattern',
+                'error': error,
+                'frequency': rec.count,
+                'affected_tests': list(rec.test_idxs)
+            }
+            for error, rec in self._significant_errors()
+        ]
+
+    def _significant_errors(self) -> List[Tuple[str, _ErrorAcc]]:
+        """Error records frequent enough to count as a pattern, in first-seen order."""
+        return [
+            (error, rec) for error, rec in self._agg.error_info.items()
+            if rec.count >= MIN_PATTERN_FREQUENCY
+        ]
 
     def analyze_cost_efficiency(self) -> List[Dict[str, Any]]:
         """Analyze cost efficiency and identify potential cost optimizations."""
         insights = []
         
-        # Analyze cost per successful test by model
-        cost_per_success = defaultdict(lambda: {'cost': 0.0, 'successes': 0})
-        for result in self.results:
-            provider = result['provider']['id']
-            if result['success']:
-                cost_per_success[provider]['cost'] += result.get('cost', 0)
-                cost_per_success[provider]['successes'] += 1
-        
-        # Calculate and compare efficiency
-        efficiencies = []
-        for provider, stats in cost_per_success.items():
-            if stats['successes'] > 0:
-                efficiency = stats['cost'] / stats['successes']
-                efficiencies.append((provider, efficiency))
+        # Calculate cost per successful test by model, tracking both extremes in one scan
+        most_efficient = least_efficient = None
+        for provider, acc in self._agg.provider_stats.items():
+            if acc.successes > 0:
+                efficiency = acc.success_cost / acc.successes
+                if most_efficient is None:
+                    most_efficient = least_efficient = (provider, efficiency)
+                elif efficiency < most_efficient[1]:
+                    most_efficient = (provider, efficiency)
+                elif efficiency >= least_efficient[1]:
+                    # Ties resolve to the last provider seen, as the former stable sort did
+                    least_efficient = (provider, efficiency)
         
-        # Sort by efficiency
-        efficiencies.sort(key=lambda x: x[1])
-        
-        if efficiencies:
+        if most_efficient is not None:
             insights.append({
                 'type': 'cost_efficiency',
-                'most_efficient': efficiencies[0],
-                'least_efficient': efficiencies[-1],
-                'efficiency_range': efficiencies[-1][1] - efficiencies[0][1]
+                'most_efficient': most_efficient,
+                'least_efficient': least_efficient,
+                'efficiency_range': least_efficient[1] - most_efficient[1]
             })
             
         return insights
 
     def analyze_error_patterns(self) -> List[Dict[str, Any]]:
         """Analyze error patterns and provide detailed insights."""
-        error_patterns = defaultdict(list)
-        for result in self.results:
-            if not result['success']:
-                error = result.get('error', 'Unknown error')
-                error_patterns[error].append({
-                    'test_idx': result['testIdx'],
-                    'provider': result['provider']['id'],
-                    'vars': result.get('vars', {}),
-                    'prompt': result.get('prompt', {}).get('raw', '')
-                })
-        
-        insights = []
-        for error, instances in error_patterns.items():
-            if len(instances) >= 3:
-                affected_models = set(i['provider'] for i in instances)
-                affected_prompts = set(i['prompt'] for i in instances)
-                insights.append({
-                    'error': error,
-                    'frequency': len(instances),
-                    'affected_models': list(affected_models),
-                    'affected_prompts': list(affected_prompts),
-                    'example_vars': instances[0]['vars']
-                })
-        
-        return insights
+        if self._error_patterns is not None:
+            return self._error_patterns
+
+        self._error_patterns = [
+            {
+                'error': error,
+                'frequency': rec.count,
+                'affected_models': list(rec.providers),
+                'affected_prompts': list(rec.prompts),
+                'example_vars': rec.first_vars
+            }
+            for error, rec in self._significant_errors()
+        ]
+        return self._error_patterns
 
     def generate_recommendations(self) -> List[Dict[str, Any]]:
         """Generate specific recommendations based on the analysis."""
         recommendations = []
         
         # Analyze success rates
-        if self.stats['successes'] / (self.stats['successes'] + self.stats['failures']) < 0.5:
+        if self._total and self._overall_success < 0.5:
             recommendations.append({
                 'category': 'Success Rate',
                 'severity': 'High',
@@ -168,23 +332,21 @@ class PromptfooAnalyzer:
                 ]
             })
 
-        # Analyze cost efficiency
-        model_costs = defaultdict(float)
-        model_successes = defaultdict(int)
-        for result in self.results:
-            provider = result['provider']['id']
-            model_costs[provider] += result.get('cost', 0)
-            if result['success']:
-                model_successes[provider] += 1
-        
         # Cost efficiency recommendations
+        provider_stats = self._agg.provider_stats
         cost_per_success = {
-            model: (cost / model_successes[model] if model_successes[model] > 0 else float('inf'))
-            for model, cost in model_costs.items()
+            model: (acc.cost / acc.successes if acc.successes > 0 else float('inf'))
+            for model, acc in provider_stats.items()
         }
         if len(cost_per_success) > 1:
-            most_efficient = min(cost_per_success.items(), key=lambda x: x[1])
-            least_efficient = max(cost_per_success.items(), key=lambda x: x[1])
+            most_efficient = least_efficient = None
+            for item in cost_per_success.items():
+                if most_efficient is None:
+                    most_efficient = least_efficient = item
+                elif item[1] < most_efficient[1]:
+                    most_efficient = item
+                elif item[1] > least_efficient[1]:
+                    least_efficient = item
             if least_efficient[1] > most_efficient[1] * 2:
                 recommendations.append({
                     'category': 'Cost Optimization',
@@ -201,7 +363,7 @@ class PromptfooAnalyzer:
         # Analyze error patterns
         error_patterns = self.analyze_error_patterns()
         for pattern in error_patterns:
-            if len(pattern['affected_models']) == len(model_costs):  # All models affected
+            if len(pattern['affected_models']) == len(provider_stats):  # All models affected
                 recommendations.append({
                     'category': 'Error Pattern',
                     'severity': 'High',
@@ -219,54 +381,54 @@ class PromptfooAnalyzer:
     def generate_detailed_report(self) -> str:
         """Generate a detailed report with analysis and recommendations."""
         report = []
+        app = report.append
         model_performance = self.analyze_model_performance()
         recommendations = self.generate_recommendations()
         
         # Header
-        report.append("=== Promptfoo Analysis Report ===")
-        report.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        app("=== Promptfoo Analysis Report ===\n"
+            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         
         # Executive Summary
-        report.append("📊 EXECUTIVE SUMMARY")
-        report.append("-----------------")
-        success_rate = (self.stats['successes'] / (self.stats['successes'] + self.stats['failures']) * 100)
-        report.append(f"Overall Success Rate: {success_rate:.1f}%")
-        report.append(f"Total Tests Run: {self.stats['successes'] + self.stats['failures']}")
-        report.append(f"Total Cost: ${sum(result.get('cost', 0) for result in self.results):.4f}\n")
+        app("📊 EXECUTIVE SUMMARY\n"
+            "-----------------\n"
+            f"Overall Success Rate: {self.overall_success_rate:.1f}%\n"
+            f"Total Tests Run: {self._total}\n"
+            f"Total Cost: ${self.total_cost:.4f}\n")
         
         # Key Findings and Recommendations
-        report.append("🔍 KEY FINDINGS & RECOMMENDATIONS")
-        report.append("-------------------------------")
+        app("🔍 KEY FINDINGS & RECOMMENDATIONS\n"
+            "-------------------------------")
         for rec in recommendations:
-            report.append(f"\n[{rec['severity']} Priority] {rec['category']}")
-            report.append(f"Finding: {rec['finding']}")
-            report.append(f"Impact: {rec['impact']}")
-            report.append("Recommended Actions:")
+            app(f"\n[{rec['severity']} Priority] {rec['category']}\n"
+                f"Finding: {rec['finding']}\n"
+                f"Impact: {rec['impact']}\n"
+                "Recommended Actions:")
             for action in rec['actions']:
-                report.append(f"  • {action}")
+                app(f"  • {action}")
         
         # Model Performance Comparison
-        report.append("\n📈 MODEL PERFORMANCE COMPARISON")
-        report.append("-----------------------------")
+        app("\n📈 MODEL PERFORMANCE COMPARISON\n"
+            "-----------------------------")
         for model, perf in model_performance.items():
-            report.append(f"\n{model}:")
-            report.append(f"  • Success Rate: {perf.success_rate:.1f}%")
-            report.append(f"  • Tests Run: {perf.total_tests}")
-            report.append(f"  • Total Cost: ${perf.total_cost:.4f}")
-            report.append(f"  • Avg Latency: {perf.avg_latency:.1f}ms")
+            app(f"\n{model}:\n"
+                f"  • Success Rate: {perf.success_rate:.1f}%\n"
+                f"  • Tests Run: {perf.total_tests}\n"
+                f"  • Total Cost: ${perf.total_cost:.4f}\n"
+                f"  • Avg Latency: {perf.avg_latency:.1f}ms")
         
         # Error Analysis
         error_patterns = self.analyze_error_patterns()
         if error_patterns:
-            report.append("\n❌ ERROR ANALYSIS")
-            report.append("---------------")
+            app("\n❌ ERROR ANALYSIS\n"
+                "---------------")
             for pattern in error_patterns:
-                report.append(f"\nError: {pattern['error']}")
-                report.append(f"Frequency: {pattern['frequency']} occurrences")
-                report.append(f"Affected Models: {', '.join(pattern['affected_models'])}")
-                report.append("Example Test Variables:")
+                app(f"\nError: {pattern['error']}\n"
+                    f"Frequency: {pattern['frequency']} occurrences\n"
+                    f"Affected Models: {', '.join(pattern['affected_models'])}\n"
+                    "Example Test Variables:")
                 for var, value in pattern['example_vars'].items():
-                    report.append(f"  • {var}: {value}")
+                    app(f"  • {var}: {value}")
         
         return "\n".join(report)
 
@@ -0,0 +1,72 @@
+"""
+Regression check for the detailed report.
+
+Runs PromptfooAnalyzer over every fixtures/<case>.json through both the
+in-memory and the streaming loader, and compares generate_detailed_report()
+with fixtures/<case>.expected.txt. Run with --update to rewrite the
+expected files after an intended output change.
+"""
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import analyze_promptfoo
+from analyze_promptfoo import PromptfooAnalyzer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def render_report(json_file: str, streaming: bool) -> str:
+    """Render the report with the timestamp dropped and set-ordered lists sorted."""
+    saved_threshold = analyze_promptfoo.STREAMING_THRESHOLD_BYTES
+    if streaming:
+        # Force even tiny fixtures through the ijson path
+        analyze_promptfoo.STREAMING_THRESHOLD_BYTES = -1
+    try:
+        with redirect_stdout(io.StringIO()):
+            report = PromptfooAnalyzer(json_file).generate_detailed_report()
+    finally:
+        analyze_promptfoo.STREAMING_THRESHOLD_BYTES = saved_threshold
+
+    lines = []
+    for line in report.split("\n"):
+        if line.startswith("Generated on: "):
+            continue
+        if line.startswith("Affected Models: "):
+            # Affected models come from a set, so their order depends on the hash seed
+            models = line[len("Affected Models: "):].split(", ")
+            line = "Affected Models: " + ", ".join(sorted(models))
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def main():
+    update = '--update' in sys.argv[1:]
+    cases = sorted(name[:-len('.json')] for name in os.listdir(FIXTURES_DIR) if name.endswith('.json'))
+    failures = 0
+
+    for case in cases:
+        json_file = os.path.join(FIXTURES_DIR, f"{case}.json")
+        expected_file = os.path.join(FIXTURES_DIR, f"{case}.expected.txt")
+        in_memory = render_report(json_file, streaming=False)
+
+        if update:
+            with open(expected_file, 'w', encoding='utf-8') as f:
+                f.write(in_memory)
+            print(f"updated  {case}")
+            continue
+
+        with open(expected_file, encoding='utf-8') as f:
+            expected = f.read()
+        for mode, report in (('in-memory', in_memory), ('streaming', render_report(json_file, streaming=True))):
+            if report == expected:
+                print(f"ok       {case} ({mode})")
+            else:
+                failures += 1
+                print(f"MISMATCH {case} ({mode})")
+
+    if failures:
+        print(f"\n{failures} report(s) differ from the expected output")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -147,9 +147,9 @@ def main():
             
             # Key Metrics Section
             st.markdown("## 📊 Key Metrics")
-            total_tests = analyzer.stats['successes'] + analyzer.stats['failures']
-            success_rate = (analyzer.stats['successes'] / total_tests * 100)
-            total_cost = sum(result.get('cost', 0) for result in analyzer.results)
+            total_tests = analyzer.total_tests
+            success_rate = analyzer.overall_success_rate
+            total_cost = analyzer.total_cost
             
             # Display metrics in a row with custom styling
             metrics_html = f"""